@@ -0,0 +1,104 @@
+# backend/bench_records.py
+# Memory / serialization benchmark for the county pipeline: keeps HORIZONS snapshots of
+# every county in memory, either as the old nested dicts or as the compact CountyRecords
+# from utils/records.py, and reports peak memory plus /predict_all serialization time.
+# Each mode runs in its own subprocess so peak RSS is not shared between them.
+#
+#   python bench_records.py                 # both modes, side by side
+#   python bench_records.py --horizons 200
+import argparse, json, random, subprocess, sys, time, tracemalloc
+from typing import Any, Dict, List
+
+def _fake_forecast(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "current": {"temperature_2m": round(rng.uniform(-5, 35), 1),
+                    "relative_humidity_2m": rng.randint(30, 100), "weather_code": rng.choice([0, 2, 3, 61])},
+        "daily": {
+            "time": ["2026-01-01", "2026-01-02", "2026-01-03"],
+            "temperature_2m_mean": [round(rng.uniform(-5, 30), 1) for _ in range(3)],
+            "relative_humidity_2m_mean": [rng.randint(35, 100) for _ in range(3)],
+        },
+    }
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(kb / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+def run_mode(mode: str, horizons: int, repeats: int) -> Dict[str, Any]:
+    from utils import ratio_store
+    from utils.records import CountyRecord
+    from utils.startup import load_counties
+    from utils.weather import _parse_forecast
+    from utils.prediction import predict_cases
+
+    rset = ratio_store.get_set()
+    counties = load_counties()
+    rng = random.Random(0)
+    payloads = [[_fake_forecast(rng) for _ in counties] for _ in range(horizons)]
+    rss_before = _peak_rss_mb()
+
+    tracemalloc.start()
+    store: List[List[Any]] = []
+    for h in range(horizons):
+        snap = []
+        for county, data in zip(counties, payloads[h]):
+            weather = _parse_forecast(data, county, rset)
+            rec = CountyRecord(county, weather, predict_cases(county, weather))
+            snap.append(rec.to_dict(rset.ratio_bands) if mode == "dicts" else rec)
+        store.append(snap)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # serialize one /predict_all response per horizon, as the edge would
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        for snap in store:
+            if mode == "dicts":
+                json.dumps(snap)
+            else:
+                json.dumps([rec.to_dict(rset.ratio_bands) for rec in snap])
+    per_response_ms = (time.perf_counter() - t0) * 1000 / (repeats * horizons)
+
+    return {
+        "mode": mode,
+        "horizons": horizons,
+        "records": horizons * len(counties),
+        "retained_kb": round(retained / 1024, 1),
+        "bytes_per_county": round(retained / (horizons * len(counties))),
+        "tracemalloc_peak_kb": round(peak / 1024, 1),
+        "peak_rss_mb": _peak_rss_mb(),
+        "rss_before_build_mb": rss_before,
+        "serialize_ms_per_response": round(per_response_ms, 3),
+    }
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="County record memory / serialization benchmark")
+    ap.add_argument("--horizons", type=int, default=96, help="snapshots kept in memory")
+    ap.add_argument("--repeats", type=int, default=5, help="serialization passes over all snapshots")
+    ap.add_argument("--mode", choices=["dicts", "records"], help="run one mode in-process (internal)")
+    args = ap.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.horizons, args.repeats)))
+        return
+
+    results = []
+    for mode in ("dicts", "records"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode,
+             "--horizons", str(args.horizons), "--repeats", str(args.repeats)],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    keys = [k for k in results[0] if k != "mode"]
+    print(f"{'':<28}" + "".join(f"{r['mode']:>14}" for r in results))
+    for k in keys:
+        print(f"{k:<28}" + "".join(f"{r[k]:>14}" for r in results))
+
+if __name__ == "__main__":
+    main()
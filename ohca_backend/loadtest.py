@@ -0,0 +1,358 @@
+# backend/loadtest.py
+# Synthetic + replayed dashboard traffic against the OHCA API.
+#
+# By default the app is served in-process on loopback and its Open-Meteo calls go to a
+# local stub, so runs are repeatable and upstream calls can be counted. Use --target to
+# hit an already running backend instead (upstream amplification is then not measured).
+#
+#   python loadtest.py                                  # every built-in scenario
+#   python loadtest.py -s morning_burst --sessions 80   # one scenario, overridden
+#   python loadtest.py --replay traffic.jsonl           # {"t": seconds, "path": "/predict/Pest"}
+#   python loadtest.py --snapshot-ttl 5                 # snapshot rebuilds every 5 s
+#
+# In-process runs reset the backend (snapshots, learned model cells) before each scenario,
+# so scenarios don't depend on run order, and use a snapshot TTL of a third of the scenario
+# unless --snapshot-ttl / SNAPSHOT_TTL says otherwise. Upstream load is reported both as
+# HTTP calls and as locations requested (the stub sees batched multi-location requests).
+import argparse, json, math, os, random, socket, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlsplit
+
+import requests
+
+# -------------------- Scenarios --------------------
+# page_path: what a dashboard page load requests (bursts on session start and refresh)
+# arrival:   "burst" = all sessions open at once, "staggered" = spread over the first third
+# think_s:   mean think time between clicks (exponential)
+# click_prob: chance a think cycle ends in a county click (/predict/{county})
+# refresh_s: seconds between page refreshes per session
+# zipf_s:    county popularity skew (rank 1 = Budapest, 2 = Pest, ...)
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "morning_burst": {
+        "sessions": 50, "duration_s": 30, "arrival": "burst", "page_path": "/predict_all",
+        "think_s": 2.0, "click_prob": 0.6, "refresh_s": 15.0, "zipf_s": 1.2,
+    },
+    "steady_browsing": {
+        "sessions": 20, "duration_s": 60, "arrival": "staggered", "page_path": "/predict_all",
+        "think_s": 5.0, "click_prob": 0.8, "refresh_s": 60.0, "zipf_s": 1.0,
+    },
+    "refresh_storm": {
+        "sessions": 30, "duration_s": 20, "arrival": "burst", "page_path": "/predict_all",
+        "think_s": 1.0, "click_prob": 0.2, "refresh_s": 3.0, "zipf_s": 1.2,
+    },
+    "summary_dashboard": {
+        "sessions": 50, "duration_s": 30, "arrival": "burst", "page_path": "/summary",
+        "think_s": 2.0, "click_prob": 0.6, "refresh_s": 15.0, "zipf_s": 1.2,
+    },
+}
+
+# Most clicked first; the rest follow hu.json order
+POPULAR_FIRST = ["Budapest", "Pest"]
+
+def _county_popularity(zipf_s: float) -> Tuple[List[str], List[float]]:
+    from utils.startup import load_counties
+    names = list(dict.fromkeys(POPULAR_FIRST + load_counties()))
+    cum, total = [], 0.0
+    for rank in range(1, len(names) + 1):
+        total += 1.0 / rank ** zipf_s
+        cum.append(total)
+    return names, cum
+
+# -------------------- Stub upstream (Open-Meteo shaped) --------------------
+class _UpstreamStub:
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.calls = 0
+        self.locations = 0  # coordinates requested, summed over the batched calls
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                # one object per requested location; a list when several were asked for
+                query = parse_qs(urlsplit(self.path).query)
+                lats = (query.get("latitude") or ["47.5"])[0].split(",")
+                lons = (query.get("longitude") or ["19.0"])[0].split(",")
+                with stub._lock:
+                    stub.calls += 1
+                    stub.locations += len(lats)
+                if stub.latency_s:
+                    time.sleep(stub.latency_s)
+                # answered from a 0.1° model grid, so nearby locations share a cell
+                locations = [{
+                    "latitude": round(float(lat), 1), "longitude": round(float(lon), 1),
+                    "elevation": 120.0,
+                    "current": {"temperature_2m": 12.3, "relative_humidity_2m": 71, "weather_code": 2},
+                    "daily": {
+                        "time": ["2026-01-01", "2026-01-02", "2026-01-03"],
+                        "temperature_2m_mean": [11.0, 13.5, 9.8],
+                        "relative_humidity_2m_mean": [70, 64, 81],
+                    },
+                } for lat, lon in zip(lats, lons)]
+                body = json.dumps(locations if len(locations) > 1 else locations[0]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/forecast"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.locations = 0
+
+    def close(self) -> None:
+        self.server.shutdown()
+
+# -------------------- In-process app on loopback --------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _serve_app() -> Tuple[str, Any, threading.Thread]:
+    import uvicorn
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config("main:app", host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="ohca-loadtest-app", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server, thread
+
+def _wait_ready(base: str, timeout_s: float = 120.0) -> None:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base}/ready", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"backend at {base} not ready after {timeout_s:.0f}s")
+
+# -------------------- Recording --------------------
+class _Recorder:
+    def __init__(self):
+        self.samples: List[Tuple[str, float, bool]] = []  # (kind, seconds, ok)
+        self._lock = threading.Lock()
+
+    def get(self, session: requests.Session, base: str, path: str, kind: str) -> None:
+        t0 = time.perf_counter()
+        try:
+            ok = session.get(base + path, timeout=30).status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - t0
+        with self._lock:
+            self.samples.append((kind, elapsed, ok))
+
+def _percentile(sorted_vals: List[float], pct: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    k = max(0, math.ceil(pct / 100.0 * len(sorted_vals)) - 1)
+    return sorted_vals[k]
+
+def _summarize(samples: List[Tuple[str, float, bool]], wall_s: float,
+               upstream_calls: Optional[int], upstream_locations: Optional[int]) -> Dict[str, Any]:
+    def stats(rows):
+        lat = sorted(s for _, s, _ in rows)
+        return {
+            "requests": len(rows),
+            "errors": sum(1 for _, _, ok in rows if not ok),
+            "p50_ms": _ms(_percentile(lat, 50)),
+            "p95_ms": _ms(_percentile(lat, 95)),
+            "p99_ms": _ms(_percentile(lat, 99)),
+        }
+    kinds = sorted({k for k, _, _ in samples})
+    out = stats(samples)
+    out["wall_s"] = round(wall_s, 2)
+    out["throughput_rps"] = round(len(samples) / wall_s, 1) if wall_s > 0 else None
+    out["upstream_calls"] = upstream_calls
+    out["upstream_per_request"] = (
+        round(upstream_calls / len(samples), 3) if upstream_calls is not None and samples else None
+    )
+    out["upstream_locations"] = upstream_locations
+    out["upstream_locations_per_request"] = (
+        round(upstream_locations / len(samples), 3) if upstream_locations is not None and samples else None
+    )
+    out["by_kind"] = {k: stats([s for s in samples if s[0] == k]) for k in kinds}
+    return out
+
+def _ms(s: Optional[float]) -> Optional[float]:
+    return None if s is None else round(s * 1000, 1)
+
+# -------------------- Traffic --------------------
+def _run_session(base: str, sc: Dict[str, Any], rec: _Recorder, names: List[str],
+                 cum: List[float], start_at: float, stop_at: float, seed: int) -> None:
+    rng = random.Random(seed)
+    with requests.Session() as session:
+        delay = start_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        rec.get(session, base, sc["page_path"], "page")
+        next_refresh = time.time() + sc["refresh_s"]
+        while True:
+            think = rng.expovariate(1.0 / sc["think_s"]) if sc["think_s"] > 0 else 0.0
+            wake = time.time() + think
+            if wake >= stop_at:
+                break
+            if wake >= next_refresh:
+                time.sleep(max(0.0, next_refresh - time.time()))
+                rec.get(session, base, sc["page_path"], "page")
+                next_refresh += sc["refresh_s"]
+                continue
+            time.sleep(think)
+            if rng.random() < sc["click_prob"]:
+                county = rng.choices(names, cum_weights=cum)[0]
+                rec.get(session, base, f"/predict/{quote(county, safe='')}", "detail")
+
+def run_scenario(base: str, sc: Dict[str, Any], seed: int = 0) -> List[Tuple[str, float, bool]]:
+    names, cum = _county_popularity(sc["zipf_s"])
+    rec = _Recorder()
+    t0 = time.time()
+    stop_at = t0 + sc["duration_s"]
+    spread = sc["duration_s"] / 3.0 if sc["arrival"] == "staggered" else 0.0
+    threads = []
+    for i in range(sc["sessions"]):
+        start_at = t0 + (spread * i / max(1, sc["sessions"]))
+        th = threading.Thread(target=_run_session, daemon=True,
+                              args=(base, sc, rec, names, cum, start_at, stop_at, seed * 100003 + i))
+        th.start()
+        threads.append(th)
+    for th in threads:
+        th.join()
+    return rec.samples
+
+def run_replay(base: str, path: str, speed: float = 1.0, workers: int = 32) -> List[Tuple[str, float, bool]]:
+    """Re-issue recorded requests ({"t": offset seconds, "path": ...} per line) on their schedule."""
+    from concurrent.futures import ThreadPoolExecutor
+    with open(path, "r", encoding="utf-8") as f:
+        events = sorted((json.loads(line) for line in f if line.strip()), key=lambda e: e["t"])
+    rec = _Recorder()
+    local = threading.local()
+
+    def fire(p: str) -> None:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        kind = "detail" if p.startswith("/predict/") else "page"
+        rec.get(local.session, base, p, kind)
+
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for e in events:
+            delay = t0 + e["t"] / speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, e["path"])
+    return rec.samples
+
+# -------------------- Backend state between runs (in-process only) --------------------
+def _snapshot_ttl(flag: Optional[float], duration_s: float) -> float:
+    if flag is not None:
+        return flag
+    if os.environ.get("SNAPSHOT_TTL"):
+        return float(os.environ["SNAPSHOT_TTL"])
+    # shorter than the run, so TTL-driven rebuilds show up in the upstream numbers
+    return max(1.0, duration_s / 3)
+
+def _replay_duration(path: str, speed: float) -> float:
+    with open(path, "r", encoding="utf-8") as f:
+        ts = [json.loads(line)["t"] for line in f if line.strip()]
+    return max(ts, default=0.0) / speed
+
+def _reset_backend(ttl_s: float) -> None:
+    # same process as the app: start each run cold, with its own TTL
+    from utils import snapshot, weather
+    snapshot.reset()
+    weather.forget_cells()
+    snapshot.SNAPSHOT_TTL = ttl_s
+
+# -------------------- CLI --------------------
+def _print_report(name: str, report: Dict[str, Any]) -> None:
+    print(f"\n=== {name} ===")
+    print(f"requests={report['requests']} errors={report['errors']} wall={report['wall_s']}s "
+          f"throughput={report['throughput_rps']} req/s")
+    print(f"latency ms: p50={report['p50_ms']} p95={report['p95_ms']} p99={report['p99_ms']}")
+    if report["upstream_calls"] is not None:
+        print(f"upstream calls={report['upstream_calls']} "
+              f"({report['upstream_per_request']} per request), "
+              f"locations={report['upstream_locations']} "
+              f"({report['upstream_locations_per_request']} per request)")
+    for kind, st in report["by_kind"].items():
+        print(f"  {kind:<7} n={st['requests']:<6} err={st['errors']:<4} "
+              f"p50={st['p50_ms']} p95={st['p95_ms']} p99={st['p99_ms']}")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Synthetic / replayed dashboard load for the OHCA API")
+    ap.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                    help="scenario to run (repeatable; default: all)")
+    ap.add_argument("--replay", help="JSONL traffic log to replay instead of scenarios")
+    ap.add_argument("--speed", type=float, default=1.0, help="replay speed-up factor")
+    ap.add_argument("--target", help="base URL of a running backend (default: serve in-process)")
+    ap.add_argument("--upstream-latency-ms", type=float, default=50.0,
+                    help="artificial latency of the stub Open-Meteo upstream")
+    for key in ("sessions", "duration_s", "think_s", "click_prob", "refresh_s", "zipf_s"):
+        ap.add_argument(f"--{key.replace('_', '-')}", dest=key,
+                        type=int if key == "sessions" else float, help=f"override scenario {key}")
+    ap.add_argument("--snapshot-ttl", type=float,
+                    help="backend snapshot TTL in seconds (in-process only; default: SNAPSHOT_TTL "
+                         "env, else a third of each scenario)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", dest="json_out", help="also write the reports to this JSON file")
+    args = ap.parse_args()
+
+    stub = server = None
+    if args.target:
+        base = args.target.rstrip("/")
+    else:
+        stub = _UpstreamStub(args.upstream_latency_ms / 1000.0)
+        os.environ["OPEN_METEO_URL"] = stub.url
+        base, server, _ = _serve_app()
+    _wait_ready(base)
+
+    reports: Dict[str, Any] = {}
+    try:
+        if args.replay:
+            runs = [("replay", None)]
+        else:
+            runs = [(name, SCENARIOS[name]) for name in (args.scenario or SCENARIOS)]
+        for name, sc in runs:
+            if sc is not None:
+                sc = dict(sc)
+                for key in ("sessions", "duration_s", "think_s", "click_prob", "refresh_s", "zipf_s"):
+                    if getattr(args, key) is not None:
+                        sc[key] = getattr(args, key)
+            if stub:
+                duration = sc["duration_s"] if sc else _replay_duration(args.replay, args.speed)
+                _reset_backend(_snapshot_ttl(args.snapshot_ttl, duration))
+                stub.reset()
+            t0 = time.perf_counter()
+            if sc is None:
+                samples = run_replay(base, args.replay, args.speed)
+            else:
+                samples = run_scenario(base, sc, args.seed)
+            report = _summarize(samples, time.perf_counter() - t0,
+                                stub.calls if stub else None, stub.locations if stub else None)
+            reports[name] = report
+            _print_report(name, report)
+    finally:
+        if server:
+            server.should_exit = True
+        if stub:
+            stub.close()
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+if __name__ == "__main__":
+    main()
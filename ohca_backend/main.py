@@ -1,21 +1,41 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import Optional
+import time
+
+# first, so its fallback process-start stamp is taken before fastapi is imported
+from utils.startup import load_counties, readiness, record_request, start_warm_up
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from utils.snapshot import changes_since, county_detail, get_snapshot, is_stale
 from utils.weather import get_weather_for_county
-from utils.prediction import predict_cases
-import json
-import os
+from utils import ratio_store
+
+
+# --- Lifespan: kick off warm-up in the background so "/" answers immediately ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_warm_up()
+    yield
+
 
 # --- Initialize FastAPI app ---
 app = FastAPI(
     title="OHCA Prediction API",
     version="1.0",
-    description="Backend for the OHCA Hungary prediction dashboard."
+    description="Backend for the OHCA Hungary prediction dashboard.",
+    lifespan=lifespan,
 )
 
-# --- Load county list from GeoJSON ---
-DATA_PATH = os.path.join(os.path.dirname(__file__), "../ohca_frontend/data/hu.json")
+_UNTIMED_PATHS = {"/", "/ready"}
+
 
-with open(DATA_PATH, "r", encoding="utf-8") as f:
-    counties = [feature["properties"]["name"] for feature in json.load(f)["features"]]
+@app.middleware("http")
+async def time_first_request(request: Request, call_next):
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    if request.url.path not in _UNTIMED_PATHS:
+        record_request(request.url.path, time.perf_counter() - t0)
+    return response
 
 
 @app.get("/")
@@ -24,33 +44,71 @@ def root():
     return {"message": "OHCA Prediction API is running!"}
 
 
+@app.get("/ready")
+def ready():
+    """Readiness: 200 once warm-up (indexes, ratio tables, first snapshot) is done, 503 before."""
+    status = readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
 @app.get("/weather/{county}")
-def weather(county: str):
+def weather(county: str, ratio_set: Optional[str] = None):
     """Fetch live weather for a given county."""
-    return get_weather_for_county(county)
+    return get_weather_for_county(county, ratio_set)
+
+
+@app.get("/bands")
+def bands(ratio_set: Optional[str] = None):
+    """Risk band thresholds and map colours from the ratio store manifest."""
+    rset = ratio_store.get_set(ratio_set)
+    if rset is None:
+        return {"error": f"Unknown ratio set: {ratio_set or ratio_store.default_set()}"}
+    return rset.bands()
+
+
+@app.get("/ratio_sets")
+def ratio_sets():
+    """Ratio sets currently loaded (one per pct* directory) and the default one."""
+    sets = ratio_store.available()  # loads the store first; the default depends on it
+    return {"default": ratio_store.default_set(), "sets": sets}
 
 
 @app.get("/predict/{county}")
-def predict(county: str):
-    """Generate mock prediction for a county using weather data."""
-    weather_data = get_weather_for_county(county)
-    prediction = predict_cases(county, weather_data)
-    return {"county": county, "weather": weather_data, "prediction": prediction}
+def predict(county: str, ratio_set: Optional[str] = None, version: Optional[int] = None):
+    """Full weather, forecast, risk and prediction for one county (sidebar detail)."""
+    return county_detail(county, load_counties(), ratio_set, version)
 
 
 @app.get("/predict_all")
-def predict_all():
-    """Generate predictions for all Hungarian counties."""
-    results = []
-    for county in counties:
-        weather_data = get_weather_for_county(county)
-        prediction = predict_cases(county, weather_data)
-        results.append({
-            "county": county,
-            "weather": weather_data,
-            "prediction": prediction
-        })
-    return results
+def predict_all(response: Response, ratio_set: Optional[str] = None):
+    """Generate predictions for all Hungarian counties (served from the shared snapshot)."""
+    snap = get_snapshot(load_counties(), ratio_set=ratio_set)
+    if "error" in snap:
+        return snap
+    # body stays a plain list; staleness rides along in headers
+    response.headers["X-Snapshot-Version"] = str(snap["version"])
+    response.headers["X-Snapshot-Stale"] = "true" if is_stale(snap) else "false"
+    return changes_since(snap)["results"]
+
+
+@app.get("/snapshot")
+def snapshot(since: Optional[int] = None, ratio_set: Optional[str] = None, refresh: bool = False):
+    """Versioned snapshot; with `since`, only counties that changed after that version."""
+    return changes_since(get_snapshot(load_counties(), ratio_set=ratio_set, refresh=refresh), since)
+
+
+@app.get("/summary")
+def summary(since: Optional[int] = None, ratio_set: Optional[str] = None, refresh: bool = False):
+    """Slim snapshot for the map: county name + predicted cases only. `refresh` rebuilds first."""
+    return changes_since(get_snapshot(load_counties(), ratio_set=ratio_set, refresh=refresh),
+                         since, summary=True)
+
+
+@app.get("/grid")
+def grid(ratio_set: Optional[str] = None):
+    """Upstream calls per snapshot build and which locations Open-Meteo served from the same model cell."""
+    snap = get_snapshot(load_counties(), ratio_set=ratio_set)
+    return snap if "error" in snap else snap["grid"]
 
 
 # --- Run server locally ---
@@ -1,15 +1,16 @@
 import random
+from utils.records import CountyWeather, Prediction
 
-def predict_cases(county: str, weather_data: dict):
+def predict_cases(county: str, weather: CountyWeather) -> Prediction:
     """Return mock predictions (placeholder for real ML model)."""
-    temp = weather_data.get("temperature", 20)
-    humidity = weather_data.get("humidity", 60)
+    temp = weather.temperature if weather.temperature is not None else 20
+    humidity = weather.humidity if weather.humidity is not None else 60
 
     # Dummy logic: cases increase slightly with temperature and humidity
     base = random.randint(40, 120)
     mortality = round(random.uniform(0.05, 0.15), 2)
 
-    return {
-        "yesterday_cases": base - random.randint(0, 15),
-        "predicted_cases": base,
-    }
+    return Prediction(
+        yesterday_cases=base - random.randint(0, 15),
+        predicted_cases=base,
+    )
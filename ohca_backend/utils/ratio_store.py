@@ -0,0 +1,296 @@
+# backend/utils/ratio_store.py
+# Registry of ratio sets (one per data/ratio_store/pct* directory), loaded side by side.
+# Each RatioSet is immutable once built; reload() builds replacements off to the side and
+# swaps the whole registry dict in one assignment, so in-flight requests keep using the
+# set they already hold while new requests see the re-fitted curves.
+import os, csv, math, json, logging, threading, time
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Optional, Dict, Tuple, Any, List
+
+log = logging.getLogger("uvicorn.error")
+
+# ------------------------- CONFIG -------------------------
+
+# Root holding the pct* set directories (override with env RATIO_STORE_DIR)
+def _store_root() -> Path:
+    env = os.environ.get("RATIO_STORE_DIR")
+    if env:
+        return Path(env)
+    return Path(__file__).resolve().parents[1] / "data" / "ratio_store"
+
+# Set served when a request does not pick one: env RATIO_SET, else the legacy RATIO_DIR
+# set (that env var used to choose the only set served) if it loaded, else pct5
+def default_set() -> str:
+    env = os.environ.get("RATIO_SET")
+    if env:
+        return env
+    legacy = os.environ.get("RATIO_DIR")
+    if legacy and Path(legacy).name in _sets:
+        return Path(legacy).name
+    return "pct5"
+
+# Band definitions for manifests written before "bands"/"case_bands" existed (RATIO_DIR
+# sets from older fits); these are the values the app used to hard-code.
+LEGACY_BANDS: Dict[str, Any] = {
+    "thresholds": [0.8, 1.3, 1.6, 2.3],
+    "emoji": ["🟩", "⬜", "🟨", "🟧", "🟥"],
+    "labels": ["Low", "Neutral-ish", "Mild", "Moderate", "High"],
+    "missing": "⬜",
+}
+LEGACY_CASE_BANDS: Dict[str, Any] = {
+    "thresholds": [60, 90],
+    "colors": ["green", "orange", "red"],
+    "emoji": ["🟩", "🟧", "🟥"],
+    "labels": ["Low", "Moderate", "High"],
+}
+
+# Seconds between file-change checks (override with env RATIO_WATCH_INTERVAL)
+WATCH_INTERVAL = float(os.environ.get("RATIO_WATCH_INTERVAL", "5"))
+
+def _bundled() -> Dict[str, Path]:
+    found: Dict[str, Path] = {}
+    root = _store_root()
+    if root.is_dir():
+        for d in sorted(root.glob("pct*")):
+            if d.is_dir():
+                found[d.name] = d
+    return found
+
+def _discover() -> Dict[str, Path]:
+    found = _bundled()
+    # Legacy single-set override (RATIO_DIR points straight at one set directory)
+    env = os.environ.get("RATIO_DIR")
+    if env:
+        found[Path(env).name] = Path(env)
+    return found
+
+def _signature(directory: Path) -> Tuple[Tuple[str, int, int], ...]:
+    out = []
+    for p in sorted(directory.iterdir()):
+        if p.is_file():
+            st = p.stat()
+            out.append((p.name, st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+# -------------------- Loading helpers (CSV + manifest) --------------------
+# Both loaders raise ValueError on anything incomplete (missing, unparseable, malformed
+# rows): a half-written file must fail the whole set so reload() keeps the previous one.
+def _load_manifest(directory: Path) -> Dict[str, Any]:
+    # manifest_<set>.json maps param -> CSV filename, plus the "bands" (ratio → emoji)
+    # and "case_bands" (predicted cases → map colour) the frontend pulls via /bands.
+    path = directory / f"manifest_{directory.name}.json"
+    if not path.exists():
+        found = sorted(directory.glob("manifest_*.json"))
+        if not found:
+            raise ValueError(f"no manifest in {directory}")
+        path = found[0]
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except Exception as e:
+        raise ValueError(f"{path.name}: {type(e).__name__}: {e}") from e
+    if not isinstance(manifest, dict):
+        raise ValueError(f"{path.name}: expected a JSON object")
+    return manifest
+
+def _load_ratio_csv(path: Path) -> Tuple[List[float], List[float]]:
+    xs: List[float] = []
+    rs: List[float] = []
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                x = float(row["x"]); r = float(row["R_hat_bc"])
+                if not (math.isfinite(x) and math.isfinite(r)):
+                    raise ValueError(f"non-finite value on line {line}")
+                xs.append(x); rs.append(r)
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"{path.name}: {type(e).__name__}: {e}") from e
+    if len(xs) < 2:
+        raise ValueError(f"{path.name}: fewer than 2 rows")
+    if any(xs[i] > xs[i+1] for i in range(len(xs)-1)):
+        pairs = sorted(zip(xs, rs), key=lambda t: t[0])
+        xs = [p[0] for p in pairs]; rs = [p[1] for p in pairs]
+    return xs, rs
+
+def _check_bands(key: str, bands: Any, per_band: str) -> Dict[str, Any]:
+    # thresholds ascending, and one `per_band` entry (emoji / colour) per band
+    if not isinstance(bands, dict):
+        raise ValueError(f"manifest has no {key!r} block")
+    thresholds = bands.get("thresholds")
+    if (not isinstance(thresholds, list) or not thresholds
+            or not all(isinstance(t, (int, float)) for t in thresholds)
+            or thresholds != sorted(thresholds)):
+        raise ValueError(f"{key}.thresholds must be a non-empty ascending list of numbers")
+    values = bands.get(per_band)
+    if not isinstance(values, list) or len(values) != len(thresholds) + 1:
+        raise ValueError(f"{key}.{per_band} needs {len(thresholds) + 1} entries")
+    return bands
+
+def _interp_ratio(xs: List[float], rs: List[float], v: float, clip: bool = True) -> float:
+    x_min, x_max = xs[0], xs[-1]
+    if clip:
+        if v <= x_min: return rs[0]
+        if v >= x_max: return rs[-1]
+    i = bisect_left(xs, v)
+    if i <= 0: return rs[0]
+    if i >= len(xs): return rs[-1]
+    x0, x1 = xs[i-1], xs[i]; r0, r1 = rs[i-1], rs[i]
+    if x1 == x0: return r0
+    t = (v - x0) / (x1 - x0)
+    return r0 + t * (r1 - r0)
+
+def _band_index(r: float, thresholds: List[float]) -> int:
+    # band i covers thresholds[i-1] <= R < thresholds[i]
+    return bisect_right(thresholds, r)
+
+def _as_float(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        v = float(value)
+    except Exception:
+        return None
+    return v if math.isfinite(v) else None
+
+# -------------------- One loaded set --------------------
+class RatioSet:
+    """
+    All tables of one pct* directory, read and compiled up front. Never mutated.
+    Raises ValueError unless the manifest, both band blocks and every listed table load
+    (a manifest without band blocks at all gets LEGACY_BANDS / LEGACY_CASE_BANDS).
+    """
+
+    def __init__(self, name: str, directory: Path):
+        self.name = name
+        self.directory = directory
+        self.signature = _signature(directory)
+        self.loaded_at = time.time()
+        manifest = _load_manifest(directory)
+        self.files = {k: v for k, v in manifest.items() if isinstance(v, str)}
+        if not self.files:
+            raise ValueError(f"manifest of {name} lists no ratio tables")
+        self.ratio_bands: Dict[str, Any] = _check_bands("bands", manifest.get("bands", LEGACY_BANDS), "emoji")
+        self.case_bands: Dict[str, Any] = _check_bands("case_bands", manifest.get("case_bands", LEGACY_CASE_BANDS), "colors")
+        self.tables: Dict[str, Tuple[List[float], List[float]]] = {}
+        for param, fname in self.files.items():
+            self.tables[param] = _load_ratio_csv(directory / fname)
+
+    def ratio(self, param: str, value: Optional[float], clip: bool = True) -> Optional[float]:
+        v = _as_float(value)
+        loaded = self.tables.get(param)
+        if v is None or not loaded:
+            return None
+        xs, rs = loaded
+        return float(_interp_ratio(xs, rs, v, clip=clip))
+
+    def risk(self, param: str, value: Optional[float]) -> Tuple[Optional[float], Optional[int]]:
+        """(ratio, band index) for a raw value: one interpolation, band read off the ratio."""
+        r = self.ratio(param, value)
+        if r is None or not math.isfinite(r):
+            return r, None
+        return r, _band_index(r, self.ratio_bands["thresholds"])
+
+    def bands(self) -> Dict[str, Any]:
+        """Band definitions from the manifest (ratio → emoji, predicted cases → map colour)."""
+        return {"ratio_set": self.name, "ratio": self.ratio_bands, "cases": self.case_bands}
+
+    def info(self) -> Dict[str, Any]:
+        return {"name": self.name, "params": sorted(self.tables), "loaded_at": self.loaded_at}
+
+# -------------------- Registry --------------------
+_lock = threading.Lock()
+_sets: Dict[str, RatioSet] = {}  # replaced wholesale by reload(), never mutated in place
+_pending: Dict[str, Any] = {}  # set name -> signature seen on the last poll
+_bad: Dict[str, Any] = {}      # set name -> signature that failed to load (not retried)
+
+def reload() -> Dict[str, List[str]]:
+    """
+    Load new/changed sets, drop removed ones, then swap the registry atomically.
+    A changed set is only re-read once its files look the same on two polls in a row
+    (a copy in progress keeps changing mtime/size); a set that then fails to load keeps
+    serving its previous tables.
+    """
+    global _sets
+    with _lock:
+        current = _sets
+        fresh: Dict[str, RatioSet] = {}
+        changed: List[str] = []
+        failed: List[str] = []
+        found = _discover()
+        bundled = _bundled()
+        for name, directory in found.items():
+            old = current.get(name)
+            try:
+                sig = _signature(directory)
+            except OSError:
+                sig = None
+            if old and old.directory == directory and old.signature == sig:
+                fresh[name] = old
+                _pending.pop(name, None)
+                continue
+            if old and _pending.get(name) != sig:
+                # first sight of this change: wait one poll for the writer to finish
+                _pending[name] = sig
+                fresh[name] = old
+                continue
+            if _bad.get(name) == sig:
+                if old:
+                    fresh[name] = old
+                continue
+            try:
+                fresh[name] = RatioSet(name, directory)
+            except Exception as e:
+                log.warning("ratio set %s not loaded, keeping previous tables: %s", name, e)
+                _bad[name] = sig
+                failed.append(name)
+                if old:
+                    fresh[name] = old
+                elif bundled.get(name, directory) != directory:
+                    # a broken RATIO_DIR must not take the bundled set of the same name down
+                    try:
+                        fresh[name] = RatioSet(name, bundled[name])
+                    except Exception:
+                        pass
+                continue
+            _pending.pop(name, None)
+            _bad.pop(name, None)
+            changed.append(name)
+        for stash in (_pending, _bad):
+            for name in [n for n in stash if n not in found]:
+                del stash[name]
+        removed = [name for name in current if name not in fresh]
+        _sets = fresh
+    return {"changed": changed, "removed": removed, "failed": failed}
+
+def get_set(name: Optional[str] = None) -> Optional[RatioSet]:
+    """The named set (default: default_set()), or None if no such set is loaded."""
+    if not _sets:
+        reload()
+    return _sets.get(name or default_set())
+
+def available() -> List[Dict[str, Any]]:
+    if not _sets:
+        reload()
+    return [s.info() for s in _sets.values()]
+
+def _watch() -> None:
+    while True:
+        time.sleep(WATCH_INTERVAL)
+        try:
+            result = reload()
+        except Exception as e:
+            log.warning("ratio store reload failed: %s: %s", type(e).__name__, e)
+            continue
+        if result["changed"] or result["removed"]:
+            log.info("ratio store hot-swapped: %s", result)
+
+_watcher: Optional[threading.Thread] = None
+
+def start_watcher() -> None:
+    """Poll the store for file changes in a daemon thread (idempotent)."""
+    global _watcher
+    if _watcher and _watcher.is_alive():
+        return
+    _watcher = threading.Thread(target=_watch, name="ohca-ratio-watch", daemon=True)
+    _watcher.start()
@@ -0,0 +1,108 @@
+# backend/utils/records.py
+# Compact in-memory county records. The pipeline (weather -> prediction -> snapshot) keeps
+# these __slots__ dataclasses; plain dicts are only produced at the API edge via to_dict().
+# Risk is stored as a band index, and the emoji is looked up from the ratio set's manifest
+# on serialization, so no per-record emoji/key strings are kept alive.
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+
+def _emoji(band: Optional[int], ratio_bands: Dict[str, Any]) -> str:
+    emoji = ratio_bands.get("emoji") or []
+    if band is None or not emoji:
+        return ratio_bands.get("missing", "⬜")
+    return emoji[band]
+
+
+@dataclass(frozen=True)
+class RiskPair:
+    __slots__ = ("temp_ratio", "temp_band", "rh_ratio", "rh_band")
+    temp_ratio: Optional[float]
+    temp_band: Optional[int]
+    rh_ratio: Optional[float]
+    rh_band: Optional[int]
+
+    def to_dict(self, ratio_bands: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "temp_ratio": self.temp_ratio, "temp_emoji": _emoji(self.temp_band, ratio_bands),
+            "rh_ratio": self.rh_ratio,     "rh_emoji": _emoji(self.rh_band, ratio_bands),
+        }
+
+
+@dataclass(frozen=True)
+class DayMean:
+    __slots__ = ("date", "temperature_mean", "humidity_mean", "risk")
+    date: str
+    temperature_mean: Optional[float]
+    humidity_mean: Optional[float]
+    risk: RiskPair
+
+    def to_dict(self, ratio_bands: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "date": self.date,
+            "temperature_mean": self.temperature_mean,
+            "humidity_mean": self.humidity_mean,
+            "risk": self.risk.to_dict(ratio_bands),
+        }
+
+
+@dataclass(frozen=True)
+class CountyWeather:
+    __slots__ = ("error", "temperature", "humidity", "conditions", "temperature_mean_today",
+                 "humidity_mean_today", "risk_today", "forecast_mean", "mortality_rate")
+    error: Optional[str]
+    temperature: Optional[float]
+    humidity: Optional[float]
+    conditions: Optional[str]
+    temperature_mean_today: Optional[float]
+    humidity_mean_today: Optional[float]
+    risk_today: Optional[RiskPair]
+    forecast_mean: Tuple[DayMean, ...]
+    mortality_rate: Any  # float, or the {"error": ...} dict from get_mortality_rate_for_county
+
+    @classmethod
+    def failed(cls, error: str) -> "CountyWeather":
+        return cls(error, None, None, None, None, None, None, (), None)
+
+    def to_dict(self, ratio_bands: Dict[str, Any]) -> Dict[str, Any]:
+        if self.error is not None:
+            return {"error": self.error}
+        return {
+            "temperature": self.temperature,
+            "humidity": self.humidity,
+            "conditions": self.conditions,
+            "temperature_mean_today": self.temperature_mean_today,
+            "humidity_mean_today": self.humidity_mean_today,
+            "risk_today": self.risk_today.to_dict(ratio_bands),
+            "forecast_mean": [day.to_dict(ratio_bands) for day in self.forecast_mean],
+            "mortality_rate": self.mortality_rate,
+        }
+
+
+@dataclass(frozen=True)
+class Prediction:
+    __slots__ = ("yesterday_cases", "predicted_cases")
+    yesterday_cases: int
+    predicted_cases: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"yesterday_cases": self.yesterday_cases, "predicted_cases": self.predicted_cases}
+
+
+@dataclass(frozen=True)
+class CountyRecord:
+    __slots__ = ("county", "weather", "prediction")
+    county: str
+    weather: CountyWeather
+    prediction: Prediction
+
+    def to_dict(self, ratio_bands: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "county": self.county,
+            "weather": self.weather.to_dict(ratio_bands),
+            "prediction": self.prediction.to_dict(),
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        # just what the map needs for colouring
+        return {"county": self.county, "predicted_cases": self.prediction.predicted_cases}
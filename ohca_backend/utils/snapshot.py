@@ -0,0 +1,239 @@
+# backend/utils/snapshot.py
+# One shared /predict_all snapshot per ratio set. Only the very first build blocks a request;
+# after that the last snapshot is always served (marked stale once it is older than
+# SNAPSHOT_TTL or its ratio set was hot-swapped) while one background job rebuilds it.
+# Counties whose upstream fetch failed keep their last good record and are retried on their
+# own with exponential backoff, so an outage or a 429 never turns into a full rebuild per
+# request. Snapshots hold compact CountyRecords (utils/records.py); dicts are only built
+# when a response is serialized.
+import logging, os, threading, time
+from typing import Any, Dict, List, Optional
+
+from utils import ratio_store
+from utils.records import CountyRecord
+from utils.weather import fetch_county_weather, fetch_weather_batch
+from utils.prediction import predict_cases
+
+log = logging.getLogger("uvicorn.error")
+
+# Seconds a snapshot stays fresh (override with env SNAPSHOT_TTL)
+SNAPSHOT_TTL = float(os.environ.get("SNAPSHOT_TTL", "600"))
+# Backoff for re-fetching failed counties: first retry after RETRY_BASE s, doubling up to
+# RETRY_MAX s (override with env SNAPSHOT_RETRY_BASE / SNAPSHOT_RETRY_MAX)
+RETRY_BASE = float(os.environ.get("SNAPSHOT_RETRY_BASE", "5"))
+RETRY_MAX = float(os.environ.get("SNAPSHOT_RETRY_MAX", "300"))
+# An explicit refresh rebuilds only snapshots at least this many seconds old, so repeated
+# clicks can't hammer upstream (override with env SNAPSHOT_REFRESH_MIN_AGE)
+REFRESH_MIN_AGE = float(os.environ.get("SNAPSHOT_REFRESH_MIN_AGE", "60"))
+
+_lock = threading.Lock()  # guards _build_locks only
+_build_locks: Dict[str, threading.Lock] = {}  # ratio set name -> held while (re)building
+_current: Dict[str, Dict[str, Any]] = {}  # ratio set name -> snapshot
+
+
+def _build_lock(name: str) -> threading.Lock:
+    with _lock:
+        return _build_locks.setdefault(name, threading.Lock())
+
+
+def build_county(county: str, rset: ratio_store.RatioSet) -> CountyRecord:
+    weather = fetch_county_weather(county, rset)
+    return CountyRecord(county, weather, predict_cases(county, weather))
+
+
+def _build_snapshot(counties: List[str], rset: ratio_store.RatioSet,
+                    only: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Fetch `only` (default: every county) and publish a new snapshot; other counties are
+    carried over from the previous one. Caller holds the set's build lock.
+    """
+    prev = _current.get(rset.name)
+    # risk bands in old records index the previous set's emoji list: after a hot-swap none
+    # of them may be carried over, so a partial retry turns into a full rebuild
+    same_set = prev is not None and prev["rset"] is rset
+    if not same_set:
+        only = None
+    prev_items = prev["by_county"] if prev else {}
+    now = time.time()
+    # Millisecond versions stay monotonic across restarts, so a client's "since" from an
+    # earlier process can never hide counties rebuilt by this one.
+    version = int(now * 1000)
+    if prev and version <= prev["version"]:
+        version = prev["version"] + 1
+    fetch = counties if only is None else only
+    # many locations per upstream request (see weather.fetch_weather_batch)
+    weathers, grid = fetch_weather_batch(fetch, rset)
+
+    results: List[CountyRecord] = []
+    changed_in: Dict[str, int] = {}
+    failed: List[str] = []
+    for county in counties:
+        old = prev_items.get(county)
+        if county in weathers:
+            weather = weathers[county]
+            if weather.error is not None:
+                failed.append(county)
+                # keep serving the last good data for this county until a retry succeeds
+                rec = old if same_set and old is not None and old.weather.error is None else None
+            elif old is not None and old.weather == weather:
+                # same weather/risk inputs: keep the record (and its prediction) unchanged,
+                # so "since" queries only return counties whose inputs actually moved
+                rec = old
+            else:
+                rec = None
+            if rec is None:
+                rec = CountyRecord(county, weather, predict_cases(county, weather))
+        else:
+            rec = old
+            if county in prev["failed"]:
+                failed.append(county)
+        results.append(rec)
+        changed_in[county] = prev["changed_in"][county] if old == rec else version
+
+    failed = list(dict.fromkeys(failed))
+    if failed:
+        delay = min(RETRY_MAX, prev["retry_delay"] * 2) if prev and prev["failed"] else RETRY_BASE
+    else:
+        delay = 0.0
+    full = only is None
+    snap = {"version": version,
+            # age counts from the last full rebuild; retries of failed counties don't reset it
+            "built_at": now if full else prev["built_at"],
+            "errors": len(failed), "failed": failed,
+            "retry_delay": delay, "retry_at": now + delay if failed else None,
+            "rset": rset if full else prev["rset"],
+            "ratio_loaded_at": rset.loaded_at if full else prev["ratio_loaded_at"],
+            "grid": grid if full else prev["grid"],
+            "results": results, "changed_in": changed_in,
+            "by_county": {rec.county: rec for rec in results}}
+    _current[rset.name] = snap
+    return snap
+
+
+def is_stale(snap: Dict[str, Any], max_age: Optional[float] = None) -> bool:
+    # too old, or its ratio set was hot-swapped since (risk blocks use the old tables)
+    if max_age is None:
+        max_age = SNAPSHOT_TTL  # read per call, so tools (loadtest.py) can change it
+    rset = ratio_store.get_set(snap["rset"].name)
+    return (time.time() - snap["built_at"] >= max_age
+            or rset is None or rset.loaded_at != snap["ratio_loaded_at"])
+
+
+def _pending_work(snap: Dict[str, Any], max_age: float) -> Optional[str]:
+    if is_stale(snap, max_age):
+        return "rebuild"
+    if snap["failed"] and time.time() >= snap["retry_at"]:
+        return "retry"
+    return None
+
+
+def _run_in_background(lock: threading.Lock, counties: List[str],
+                       rset: ratio_store.RatioSet, work: str) -> None:
+    # called with `lock` already acquired; releases it when done
+    def job():
+        try:
+            prev = _current.get(rset.name)
+            if work == "retry" and prev is not None:
+                _build_snapshot(counties, rset, only=prev["failed"])
+            else:
+                _build_snapshot(counties, rset)
+        except Exception as e:
+            log.warning("snapshot %s for %s failed: %s: %s", work, rset.name, type(e).__name__, e)
+        finally:
+            lock.release()
+    threading.Thread(target=job, name=f"ohca-snapshot-{work}", daemon=True).start()
+
+
+def get_snapshot(counties: List[str], max_age: Optional[float] = None,
+                 ratio_set: Optional[str] = None, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Current snapshot. Blocks only while the first one is built; afterwards a stale snapshot
+    or due retries start one background job and the existing snapshot is returned.
+    refresh=True rebuilds in place (if older than REFRESH_MIN_AGE) and waits for it;
+    concurrent refreshes share one rebuild.
+    """
+    rset = ratio_store.get_set(ratio_set)
+    if rset is None:
+        return {"error": f"Unknown ratio set: {ratio_set or ratio_store.default_set()}"}
+    lock = _build_lock(rset.name)
+    snap = _current.get(rset.name)
+    if refresh and (snap is None or time.time() - snap["built_at"] >= REFRESH_MIN_AGE):
+        asked_at = time.time()
+        with lock:
+            snap = _current.get(rset.name)
+            if snap is None or snap["built_at"] < asked_at - REFRESH_MIN_AGE:
+                snap = _build_snapshot(counties, rset)
+        return snap
+    if snap is None:
+        with lock:
+            snap = _current.get(rset.name)
+            if snap is None:
+                snap = _build_snapshot(counties, rset)
+        return snap
+    work = _pending_work(snap, max_age)
+    if work and lock.acquire(blocking=False):  # already running → nothing to start
+        _run_in_background(lock, counties, rset, work)
+    return snap
+
+
+def reset() -> None:
+    """Drop every snapshot (waiting out builds in flight), as if the process had just started."""
+    with _lock:
+        locks = list(_build_locks.values())
+    for lock in locks:
+        lock.acquire()
+    try:
+        _current.clear()
+    finally:
+        for lock in locks:
+            lock.release()
+
+
+def county_detail(county: str, counties: List[str], ratio_set: Optional[str] = None,
+                  version: Optional[int] = None) -> Dict[str, Any]:
+    """
+    One county's full record from the current snapshot (same freshness rules as
+    get_snapshot). With the client's map `version`, version_mismatch says whether this
+    record changed after it, i.e. the map colour is behind the sidebar.
+    """
+    snap = get_snapshot(counties, ratio_set=ratio_set)
+    if "error" in snap:
+        return snap
+    rec = snap["by_county"].get(county)
+    if rec is None:
+        # not on the map: fetch live, there is no snapshot version to agree with
+        rset = ratio_store.get_set(ratio_set)
+        return build_county(county, rset).to_dict(rset.ratio_bands)
+    out = rec.to_dict(snap["rset"].ratio_bands)
+    out["version"] = snap["version"]
+    out["stale"] = is_stale(snap)
+    out["version_mismatch"] = version is not None and (
+        version > snap["version"] or snap["changed_in"][county] > version)
+    return out
+
+
+def changes_since(snap: Dict[str, Any], since: Optional[int] = None, summary: bool = False) -> Dict[str, Any]:
+    """Counties whose data changed after version `since` (everything if `since` is None)."""
+    if "error" in snap:
+        return snap
+    full = since is None or since > snap["version"]
+    if full:
+        results = snap["results"]
+    else:
+        changed_in = snap["changed_in"]
+        results = [rec for rec in snap["results"] if changed_in[rec.county] > since]
+    if summary:
+        out = [rec.summary() for rec in results]
+    else:
+        ratio_bands = snap["rset"].ratio_bands
+        out = [rec.to_dict(ratio_bands) for rec in results]
+    return {
+        "version": snap["version"],
+        "built_at": snap["built_at"],
+        "age_s": round(time.time() - snap["built_at"], 1),
+        "ratio_set": snap["rset"].name,
+        "stale": is_stale(snap),
+        "failed": snap["failed"],
+        "full": full,
+        "results": out,
+    }
@@ -0,0 +1,114 @@
+# backend/utils/startup.py
+# Deferred startup: nothing heavy runs at import time. warm_up() (started from the app
+# lifespan in a background thread) builds the county list, centroid index, every ratio
+# set (then starts the ratio store watcher) and the first snapshot, timing each step.
+import json, logging, os, threading, time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils import ratio_store
+from utils.weather import _all_coords
+from utils.snapshot import get_snapshot
+
+# County list comes from the frontend GeoJSON (override with env COUNTIES_GEOJSON)
+def _counties_path() -> Path:
+    env = os.environ.get("COUNTIES_GEOJSON")
+    if env:
+        return Path(env)
+    return Path(__file__).resolve().parents[2] / "ohca_frontend" / "data" / "hu.json"
+
+@lru_cache(maxsize=1)
+def load_counties() -> List[str]:
+    with open(_counties_path(), "r", encoding="utf-8") as f:
+        return [feature["properties"]["name"] for feature in json.load(f)["features"]]
+
+log = logging.getLogger("uvicorn.error")
+
+def _process_age_s() -> Optional[float]:
+    # Linux: process start (clock ticks since boot, /proc/self/stat field 22) vs uptime
+    try:
+        with open("/proc/self/stat", "r") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except Exception:
+        return None
+
+_lock = threading.Lock()
+_age = _process_age_s()
+_state: Dict[str, Any] = {
+    "ready": False,
+    "error": None,
+    # real process start where the OS tells us; otherwise this module's import, which
+    # main.py does before importing fastapi
+    "process_start": time.perf_counter() - (_age or 0.0),
+    "process_start_source": "os" if _age is not None else "import",
+    "warmup_started": None,
+    "warmup_finished": None,
+    "steps_ms": {},
+    "first_request": None,
+    "grid": None,
+}
+
+def _step(name: str, fn) -> Any:
+    t0 = time.perf_counter()
+    out = fn()
+    _state["steps_ms"][name] = round((time.perf_counter() - t0) * 1000, 1)
+    return out
+
+def warm_up() -> None:
+    _state["warmup_started"] = time.perf_counter()
+    try:
+        counties = _step("counties", load_counties)
+        _step("coords_index", _all_coords)
+        _step("ratio_tables", ratio_store.reload)
+        ratio_store.start_watcher()
+        snap = _step("first_snapshot", lambda: get_snapshot(counties))
+        if "error" in snap:
+            # e.g. RATIO_SET names a set that isn't there: every data endpoint would fail
+            _state["error"] = snap["error"]
+        else:
+            _state["grid"] = snap.get("grid")
+            _state["ready"] = True
+    except Exception as e:
+        _state["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        _state["warmup_finished"] = time.perf_counter()
+    log.info("warm-up %s: %s", "done" if _state["ready"] else "failed", readiness())
+
+def start_warm_up() -> threading.Thread:
+    t = threading.Thread(target=warm_up, name="ohca-warm-up", daemon=True)
+    t.start()
+    return t
+
+def record_request(path: str, elapsed_s: float) -> None:
+    """Keep the latency of the first real (non health/readiness) request."""
+    if _state["first_request"] is not None:
+        return
+    with _lock:
+        if _state["first_request"] is None:
+            _state["first_request"] = {
+                "path": path,
+                "latency_ms": round(elapsed_s * 1000, 1),
+                "before_ready": not _state["ready"],
+            }
+
+def _ms_since_start(t: Optional[float]) -> Optional[float]:
+    if t is None:
+        return None
+    return round((t - _state["process_start"]) * 1000, 1)
+
+def readiness() -> Dict[str, Any]:
+    started, finished = _state["warmup_started"], _state["warmup_finished"]
+    return {
+        "ready": _state["ready"],
+        "error": _state["error"],
+        "cold_start_ms": _ms_since_start(finished) if _state["ready"] else None,
+        "cold_start_from": _state["process_start_source"],
+        "warmup_ms": round((finished - started) * 1000, 1) if started and finished else None,
+        "steps_ms": dict(_state["steps_ms"]),
+        "first_request": _state["first_request"],
+        "grid": _state["grid"],
+    }
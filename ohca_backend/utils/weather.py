@@ -1,22 +1,24 @@
 # backend/utils/weather.py
 # Minimal-deps backend: stdlib + requests. Adds centroid fallback for any unmapped names.
-import os, csv, math, json, unicodedata
-from bisect import bisect_left
+# Nothing here touches disk or network at import time; ratio tables live in utils/ratio_store.py.
+import os, sys, json, unicodedata
 from functools import lru_cache
 from pathlib import Path
 from typing import Optional, Dict, Tuple, Any, List
 
-import requests
 from utils.mortality import get_mortality_rate_for_county
+from utils import ratio_store
+from utils.records import CountyWeather, DayMean, RiskPair
 
 # ------------------------- CONFIG -------------------------
 
-# Where the saved ratio CSVs live (can override with env RATIO_DIR)
-def _ratio_dir() -> Path:
-    env = os.environ.get("RATIO_DIR")
-    if env:
-        return Path(env)
-    return Path(__file__).resolve().parents[1] / "data" / "ratio_store" / "pct5"
+# Open-Meteo forecast endpoint (override with env OPEN_METEO_URL, e.g. a load-test stub)
+def _forecast_url() -> str:
+    return os.environ.get("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+
+# Locations per multi-coordinate forecast request (override with env OPEN_METEO_BATCH)
+def _batch_size() -> int:
+    return max(1, int(os.environ.get("OPEN_METEO_BATCH", "10")))
 
 # Where to find the ORIGINAL (unfiltered) GeoJSON.
 # We try several common places, or override via GEOJSON_PATH env var.
@@ -27,6 +29,7 @@ def _geojson_path() -> Optional[Path]:
     base = Path(__file__).resolve().parents[1]  # .../backend
     cand += [
         base / "data" / "hu.json",     # backend/data/hu.json
+        base.parents[0] / "ohca_frontend" / "data" / "hu.json",  # frontend copy
         base.parents[0] / "data" / "hu.json",  # <repo_root>/data/hu.json
         Path("data/hu.json"),          # CWD relative
     ]
@@ -220,75 +223,44 @@ def _coords_for(name: str) -> Optional[Tuple[float, float]]:
             return v
     return None
 
-# -------------------- Ratio loading (CSV only) --------------------
-_PARAM_TO_FILENAME = {
-    "temp_c": "temp_c_ratio_pct5.csv",
-    "rh_pct": "rh_pct_ratio_pct5.csv",
-}
+# -------------------- Batch planning --------------------
+Point = Tuple[float, float]
 
-@lru_cache(maxsize=8)
-def _load_ratio_csv(param: str) -> Optional[Tuple[List[float], List[float]]]:
-    fname = _PARAM_TO_FILENAME.get(param)
-    if not fname:
-        return None
-    path = _ratio_dir() / fname
-    if not path.exists():
-        return None
-
-    xs: List[float] = []
-    rs: List[float] = []
-    try:
-        with path.open("r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                try:
-                    x = float(row["x"]); r = float(row["R_hat_bc"])
-                    if math.isfinite(x) and math.isfinite(r):
-                        xs.append(x); rs.append(r)
-                except Exception:
-                    continue
-        if len(xs) < 2:
-            return None
-        if any(xs[i] > xs[i+1] for i in range(len(xs)-1)):
-            pairs = sorted(zip(xs, rs), key=lambda t: t[0])
-            xs = [p[0] for p in pairs]; rs = [p[1] for p in pairs]
-        return xs, rs
-    except Exception:
-        return None
-
-def _interp_ratio(xs: List[float], rs: List[float], v: float, clip: bool = True) -> float:
-    x_min, x_max = xs[0], xs[-1]
-    if clip:
-        if v <= x_min: return rs[0]
-        if v >= x_max: return rs[-1]
-    i = bisect_left(xs, v)
-    if i <= 0: return rs[0]
-    if i >= len(xs): return rs[-1]
-    x0, x1 = xs[i-1], xs[i]; r0, r1 = rs[i-1], rs[i]
-    if x1 == x0: return r0
-    t = (v - x0) / (x1 - x0)
-    return r0 + t * (r1 - r0)
-
-def _ratio_value(param: str, value: Optional[float], clip: bool = True) -> Optional[float]:
-    if value is None:
-        return None
-    loaded = _load_ratio_csv(param)
-    if not loaded:
-        return None
-    xs, rs = loaded
-    try:
-        v = float(value)
-    except Exception:
-        return None
-    return float(_interp_ratio(xs, rs, v, clip=clip))
+def _plan_points(names: List[str]) -> Tuple[Dict[Point, List[str]], List[str]]:
+    """Group names by their exact coordinates (aliases share one); returns (by_point, unknown)."""
+    by_point: Dict[Point, List[str]] = {}
+    unknown: List[str] = []
+    for name in dict.fromkeys(names):  # hu.json lists some names twice (e.g. Veszprém)
+        coords = _coords_for(name)
+        if not coords:
+            unknown.append(name)
+            continue
+        by_point.setdefault(coords, []).append(name)
+    return by_point, unknown
+
+def _model_cell(data: Dict[str, Any]) -> str:
+    # the grid point (and elevation) Open-Meteo actually served this location from; two
+    # locations with the same key get byte-identical forecasts (temperature is downscaled
+    # to the returned elevation, so that has to match too)
+    return "{},{},{}".format(data.get("latitude"), data.get("longitude"), data.get("elevation"))
+
+# Location -> model cell, learned from responses. Once two locations are known to share a
+# cell, later fetches request only one of them and fan the answer out.
+_cell_of: Dict[Point, str] = {}
 
-def _ratio_emoji(r: Optional[float]) -> str:
-    if r is None or not math.isfinite(r): return "⬜"
-    if r < 0.8:  return "🟩"
-    if r < 1.3:  return "⬜"
-    if r < 1.6:  return "🟨"
-    if r < 2.3:  return "🟧"
-    return "🟥"
+def forget_cells() -> None:
+    """Drop the learned location -> model cell map (next fetch requests every location)."""
+    _cell_of.clear()
+
+def _plan_fetch(points: List[Point]) -> Tuple[List[Point], Dict[Point, List[Point]]]:
+    """(points to request, representative -> every point it answers for)."""
+    reps: Dict[str, Point] = {}
+    covers: Dict[Point, List[Point]] = {}
+    for point in points:
+        cell = _cell_of.get(point)
+        rep = reps.setdefault(cell, point) if cell is not None else point
+        covers.setdefault(rep, []).append(point)
+    return list(covers), covers
 
 # -------------------- API: weather + risk --------------------
 _WMO_CODE_TEXT = {
@@ -303,77 +275,182 @@ _WMO_CODE_TEXT = {
     95: "Thunderstorm", 96: "Thunderstorm with slight hail", 99: "Thunderstorm with heavy hail",
 }
 
-def get_weather_for_county(county_name: str) -> Dict[str, Any]:
-    """
-    Fetch weather and attach risk (pct=5 ratio) for today's daily means and the next 2 days.
-    Works for both your 20 counties and any other names present in the original GeoJSON.
-    """
-    coords = _coords_for(county_name)
-    if not coords:
-        return {"error": f"Unknown area: {county_name}"}
-    lat, lon = coords
+def _parse_forecast(data: Dict[str, Any], county_name: str,
+                    rset: ratio_store.RatioSet) -> CountyWeather:
+    cur = data.get("current", {}) or {}
+    current_temp = cur.get("temperature_2m")
+    current_hum = cur.get("relative_humidity_2m")
+    wmo_code = cur.get("weather_code")
+    conditions_text = _WMO_CODE_TEXT.get(wmo_code) or sys.intern("Fair" if wmo_code is None else f"WMO {wmo_code}")
+
+    daily = data.get("daily", {}) or {}
+    times: List[str] = daily.get("time") or []
+    tmean: List[Optional[float]] = daily.get("temperature_2m_mean") or []
+    hmean: List[Optional[float]] = daily.get("relative_humidity_2m_mean") or []
 
-    url = "https://api.open-meteo.com/v1/forecast"
+    def risk_pair(t: Optional[float], h: Optional[float]) -> RiskPair:
+        return RiskPair(*rset.risk("temp_c", t), *rset.risk("rh_pct", h))
+
+    t_today = tmean[0] if len(tmean) > 0 else None
+    h_today = hmean[0] if len(hmean) > 0 else None
+
+    forecast_mean = []
+    for i in (1, 2):
+        if i < len(times):
+            t = tmean[i] if i < len(tmean) else None
+            h = hmean[i] if i < len(hmean) else None
+            forecast_mean.append(DayMean(times[i], t, h, risk_pair(t, h)))
+
+    return CountyWeather(
+        error=None,
+        temperature=current_temp,
+        humidity=current_hum,
+        conditions=conditions_text,
+        temperature_mean_today=t_today,
+        humidity_mean_today=h_today,
+        risk_today=risk_pair(t_today, h_today),
+        forecast_mean=tuple(forecast_mean),
+        mortality_rate=get_mortality_rate_for_county(county_name),
+    )
+
+def _fetch_points(points: List[Point]) -> List[Dict[str, Any]]:
+    """One forecast request for all `points` (Open-Meteo takes comma-separated lat/lon lists)."""
     params = {
-        "latitude": lat,
-        "longitude": lon,
+        "latitude": ",".join(str(lat) for lat, _ in points),
+        "longitude": ",".join(str(lon) for _, lon in points),
         "timezone": "Europe/Budapest",
         "current": "temperature_2m,relative_humidity_2m,weather_code",
         "daily": "temperature_2m_mean,relative_humidity_2m_mean",
         "forecast_days": 3,
     }
+    import requests  # deferred: keeps app import (and "/" health checks) light
+    r = requests.get(_forecast_url(), params=params, timeout=8)
+    r.raise_for_status()
+    data = r.json()
+    # a single location comes back as one object, several as a list in request order
+    out = data if isinstance(data, list) else [data]
+    if len(out) != len(points):
+        raise ValueError(f"expected {len(points)} locations, got {len(out)}")
+    return out
 
+def fetch_county_weather(county_name: str, rset: ratio_store.RatioSet) -> CountyWeather:
+    """Fetch weather and attach risk from `rset`, as a compact record (see utils/records.py)."""
+    coords = _coords_for(county_name)
+    if not coords:
+        return CountyWeather.failed(f"Unknown area: {county_name}")
     try:
-        r = requests.get(url, params=params, timeout=8)
-        r.raise_for_status()
-        data = r.json()
-
-        cur = data.get("current", {}) or {}
-        current_temp = cur.get("temperature_2m")
-        current_hum = cur.get("relative_humidity_2m")
-        wmo_code = cur.get("weather_code")
-        conditions_text = _WMO_CODE_TEXT.get(wmo_code, "Fair" if wmo_code is None else f"WMO {wmo_code}")
-
-        daily = data.get("daily", {}) or {}
-        times: List[str] = daily.get("time") or []
-        tmean: List[Optional[float]] = daily.get("temperature_2m_mean") or []
-        hmean: List[Optional[float]] = daily.get("relative_humidity_2m_mean") or []
-
-        def risk_pair(t: Optional[float], h: Optional[float]) -> Dict[str, Any]:
-            rt = _ratio_value("temp_c", t)
-            rh = _ratio_value("rh_pct", h)
-            return {
-                "temp_ratio": rt, "temp_emoji": _ratio_emoji(rt),
-                "rh_ratio": rh,   "rh_emoji": _ratio_emoji(rh),
-            }
-
-        t_today = tmean[0] if len(tmean) > 0 else None
-        h_today = hmean[0] if len(hmean) > 0 else None
-        risk_today = risk_pair(t_today, h_today)
-
-        forecast_mean = []
-        for i in (1, 2):
-            if i < len(times):
-                entry = {
-                    "date": times[i],
-                    "temperature_mean": (tmean[i] if i < len(tmean) else None),
-                    "humidity_mean": (hmean[i] if i < len(hmean) else None),
-                }
-                entry["risk"] = risk_pair(entry["temperature_mean"], entry["humidity_mean"])
-                forecast_mean.append(entry)
-
-        mortality = get_mortality_rate_for_county(county_name)
-
-        return {
-            "temperature": current_temp,
-            "humidity": current_hum,
-            "conditions": conditions_text,
-            "temperature_mean_today": t_today,
-            "humidity_mean_today": h_today,
-            "risk_today": risk_today,
-            "forecast_mean": forecast_mean,
-            "mortality_rate": mortality,
-        }
+        data = _fetch_points([coords])[0]
+        _cell_of[coords] = _model_cell(data)
+        return _parse_forecast(data, county_name, rset)
+    except Exception as e:
+        return CountyWeather.failed(f"{type(e).__name__}: {e}")
 
+def _splittable(e: Exception) -> bool:
+    # a bad location (4xx other than 429, or a malformed answer) is isolated by splitting the
+    # batch; timeouts, 5xx and rate limits hit every location alike, so those are not retried
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if status is not None:
+        return 400 <= status < 500 and status != 429
+    return isinstance(e, ValueError)
+
+def _fetch_chunk(points: List[Point], got: Dict[Point, Any]) -> int:
+    """Fetch `points` into got[point] (payload, or the exception); returns upstream calls made."""
+    try:
+        payloads = _fetch_points(points)
     except Exception as e:
-        return {"error": f"{type(e).__name__}: {e}"}
+        if len(points) > 1 and _splittable(e):
+            mid = len(points) // 2
+            return 1 + _fetch_chunk(points[:mid], got) + _fetch_chunk(points[mid:], got)
+        for point in points:
+            got[point] = e
+        return 1
+    for point, data in zip(points, payloads):
+        got[point] = data
+    return 1
+
+def _fetch_all(points: List[Point]) -> Tuple[Dict[Point, Any], int]:
+    got: Dict[Point, Any] = {}
+    calls = 0
+    size = _batch_size()
+    for start in range(0, len(points), size):
+        calls += _fetch_chunk(points[start:start + size], got)
+    return got, calls
+
+def fetch_weather_batch(names: List[str], rset: ratio_store.RatioSet
+                        ) -> Tuple[Dict[str, CountyWeather], Dict[str, Any]]:
+    """
+    Weather for many names at their own coordinates. Locations already known to share a
+    model cell are requested once and the answer fanned out; the rest go OPEN_METEO_BATCH
+    per upstream request. Returns (name -> record, stats).
+    """
+    by_point, unknown = _plan_points(names)
+    out: Dict[str, CountyWeather] = {
+        name: CountyWeather.failed(f"Unknown area: {name}") for name in unknown
+    }
+    request, covers = _plan_fetch(list(by_point))
+    got, calls = _fetch_all(request)
+
+    answer: Dict[Point, Any] = {}
+    regroup: List[Point] = []
+    for rep, members in covers.items():
+        data = got[rep]
+        if isinstance(data, Exception):
+            for point in members:
+                answer[point] = data
+            continue
+        cell = _model_cell(data)
+        for point in members:
+            if point == rep or _cell_of.get(point) == cell:
+                answer[point] = data
+            else:
+                # the representative moved to another cell: its old cell-mates get their own
+                # fetch (and their cells re-learned) before anything is fanned out to them
+                _cell_of.pop(point, None)
+                regroup.append(point)
+        _cell_of[rep] = cell
+    if regroup:
+        more, extra_calls = _fetch_all(regroup)
+        calls += extra_calls
+        for point, data in more.items():
+            answer[point] = data
+            if not isinstance(data, Exception):
+                _cell_of[point] = _model_cell(data)
+
+    for point, data in answer.items():
+        for name in by_point[point]:
+            if isinstance(data, Exception):
+                out[name] = CountyWeather.failed(f"{type(data).__name__}: {data}")
+                continue
+            try:
+                out[name] = _parse_forecast(data, name, rset)
+            except Exception as e:
+                out[name] = CountyWeather.failed(f"{type(e).__name__}: {e}")
+
+    cells: Dict[str, List[str]] = {}
+    for point, members in by_point.items():
+        if point in _cell_of:
+            cells.setdefault(_cell_of[point], []).extend(members)
+    located = sum(len(members) for members in by_point.values())
+    requested = len(request) + len(regroup)
+    stats = {
+        "locations": located,
+        "requested": requested,
+        "dedup_ratio": round(located / requested, 3) if requested else None,
+        "upstream_calls": calls,
+        "locations_per_call": round(located / calls, 3) if calls else None,
+        "model_cells": len(cells),
+        "shared": {cell: members for cell, members in cells.items() if len(members) > 1},
+        "unknown": unknown,
+    }
+    return out, stats
+
+def get_weather_for_county(county_name: str, ratio_set: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Fetch weather and attach risk (ratio set `ratio_set`, default pct5) for today's daily
+    means and the next 2 days.
+    Works for both your 20 counties and any other names present in the original GeoJSON.
+    """
+    rset = ratio_store.get_set(ratio_set)
+    if rset is None:
+        return {"error": f"Unknown ratio set: {ratio_set or ratio_store.default_set()}"}
+    return fetch_county_weather(county_name, rset).to_dict(rset.ratio_bands)
@@ -2,19 +2,14 @@ import streamlit as st
 import folium
 from streamlit_folium import st_folium
 import json
-import requests
-import os
-from dotenv import load_dotenv
+from bisect import bisect_right
 from shapely.geometry import shape, Point
 from datetime import datetime
 from weather_sidebar import render_weather_sidebar as render_weather_sidebar
+from backend_client import fetch_bands, fetch_summary, fetch_county_detail, start_refresh, merge_refresh
 
 
 
-# --- LOAD ENV VARIABLES ---
-load_dotenv()
-BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000/predict_all")
-
 # --- STREAMLIT PAGE SETUP ---
 st.set_page_config(page_title="OHCA Prediction Map", layout="wide")
 st.title("🩺 OHCA Prediction Dashboard — Hungary")
@@ -36,33 +31,45 @@ def load_geojson():
 
 counties = load_geojson()
 
-# --- FETCH DATA FROM BACKEND ---
-def fetch_data():
-    try:
-        response = requests.get(BACKEND_URL, timeout=10)
-        response.raise_for_status()
-        data_list = response.json()
-
-        data_dict = {}
-        for item in data_list:
-            county = item["county"]
-            prediction = item.get("prediction", {})
-            weather = item.get("weather", {})
-            combined = {**prediction, **weather}
-            data_dict[county] = combined
-        
-        return data_dict, "✅ Data successfully loaded from backend."
-    except Exception as e:
-        return None, f"❌ Failed to load data from backend: {e}"
+# --- FETCH RISK BANDS (thresholds live in the backend ratio store manifest) ---
+try:
+    bands = fetch_bands()
+except Exception as e:
+    st.error(f"❌ Failed to load risk bands from backend: {e}")
+    st.stop()
 
+# --- FETCH MAP SUMMARY FROM BACKEND (TTL-cached, shared across sessions) ---
 if "county_data" not in st.session_state:
-    data_dict, message = fetch_data()
-    if data_dict:
-        st.session_state.county_data = data_dict
-        st.success(message)
-    else:
-        st.error(message)
+    try:
+        snapshot = fetch_summary()
+    except Exception as e:
+        st.error(f"❌ Failed to load data from backend: {e}")
         st.stop()
+    st.session_state.county_data = snapshot["counties"]
+    st.session_state.snapshot_version = snapshot["version"]
+    st.session_state.snapshot_built_at = snapshot["built_at"]
+    st.session_state.snapshot_stale = snapshot["stale"]
+    st.success("✅ Data successfully loaded from backend.")
+
+# --- BACKGROUND REFRESH: keep showing current data, swap in changes when ready ---
+@st.fragment(run_every=1)
+def poll_refresh():
+    future = st.session_state.get("refresh_future")
+    if future is None or not future.done():
+        st.caption("⏳ Refreshing data in the background…")
+        return
+    st.session_state.pop("refresh_future", None)
+    try:
+        result = future.result()
+    except Exception as e:
+        st.session_state.refresh_error = f"❌ Refresh failed: {e}"
+    else:
+        st.session_state.county_data, st.session_state.snapshot_version = merge_refresh(
+            st.session_state.county_data, st.session_state.snapshot_version, result
+        )
+        st.session_state.snapshot_built_at = result["built_at"]
+        st.session_state.snapshot_stale = result["stale"]
+    st.rerun()
 
 data_dict = st.session_state.county_data
 
@@ -70,19 +77,30 @@ data_dict = st.session_state.county_data
 sidebar = st.sidebar
 sidebar.header("📊 County Dashboard")
 
-if sidebar.button("🔄 Refresh data"):
-    st.session_state.pop("county_data", None)
-    st.session_state.pop("selected_county", None)
-    st.rerun()
+if sidebar.button("🔄 Refresh data", disabled="refresh_future" in st.session_state):
+    st.session_state.pop("refresh_error", None)
+    st.session_state.refresh_future = start_refresh(st.session_state.snapshot_version)
+
+# --- DATA AGE (the backend serves a shared snapshot, so say how old it is) ---
+if st.session_state.get("snapshot_built_at"):
+    built = datetime.fromtimestamp(st.session_state.snapshot_built_at)
+    age_min = int((datetime.now() - built).total_seconds() // 60)
+    stale_note = " — update pending" if st.session_state.get("snapshot_stale") else ""
+    sidebar.caption(f"🕒 Data as of {built:%H:%M} ({age_min} min ago){stale_note}")
+
+if "refresh_future" in st.session_state:
+    with sidebar:
+        poll_refresh()
+if st.session_state.get("refresh_error"):
+    sidebar.error(st.session_state.refresh_error)
 
 # --- COLOR SCALE ---
 def color_scale(value):
-    if value is None or value < 60:
-        return "green"
-    elif value < 90:
-        return "orange"
-    else:
-        return "red"
+    case_bands = bands.get("cases", {})
+    colors = case_bands.get("colors") or ["green"]
+    if value is None:
+        return colors[0]
+    return colors[bisect_right(case_bands.get("thresholds") or [], value)]
 
 # --- INITIAL MAP SETTINGS ---
 center = [46.3, 19.5033]
@@ -163,5 +181,12 @@ if map_click_data and map_click_data.get("last_clicked"):
 # --- SHOW COUNTY DETAILS IN SIDEBAR ---wa
 if st.session_state.get("selected_county"):
     county_name = st.session_state["selected_county"]
-    county_data = data_dict.get(county_name, {})
-    render_weather_sidebar(sidebar, county_name, county_data)
+    try:
+        county_data = fetch_county_detail(county_name, st.session_state.snapshot_version)
+        # backend has newer data than the map: pull the changes so colours match the sidebar
+        if county_data.get("version_mismatch") and "refresh_future" not in st.session_state:
+            st.session_state.refresh_future = start_refresh(st.session_state.snapshot_version, rebuild=False)
+    except Exception as e:
+        sidebar.error(f"❌ Failed to load details for {county_name}: {e}")
+        county_data = data_dict.get(county_name, {})
+    render_weather_sidebar(sidebar, county_name, county_data, bands)
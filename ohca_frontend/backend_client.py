@@ -0,0 +1,130 @@
+# backend_client.py
+# Frontend data layer: one pooled HTTP session, TTL-cached map summary, per-county detail
+# fetched on demand, and a background refresh that only pulls counties changed since the
+# snapshot version we already show.
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+import streamlit as st
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+load_dotenv()
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000/predict_all")
+BACKEND_BASE = os.getenv("BACKEND_BASE", BACKEND_URL.rsplit("/", 1)[0])
+BANDS_URL = os.getenv("BANDS_URL", f"{BACKEND_BASE}/bands")
+RATIO_SETS_URL = os.getenv("RATIO_SETS_URL", f"{BACKEND_BASE}/ratio_sets")
+SUMMARY_URL = os.getenv("SUMMARY_URL", f"{BACKEND_BASE}/summary")
+DETAIL_URL = os.getenv("DETAIL_URL", f"{BACKEND_BASE}/predict")
+SNAPSHOT_TTL = int(os.getenv("SNAPSHOT_TTL", "300"))
+# Seconds between checks for a hot-swapped ratio set (new thresholds → new legend/colours)
+BANDS_CHECK_TTL = int(os.getenv("BANDS_CHECK_TTL", "30"))
+# Backend ratio set (pct* directory) to colour risk with; unset = backend default
+RATIO_SET = os.getenv("RATIO_SET")
+
+
+@st.cache_resource
+def get_session():
+    """Keep-alive session shared by every script run and user session."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def _refresh_executor():
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="ohca-refresh")
+
+
+def _get_json(url, params=None):
+    params = dict(params or {})
+    if RATIO_SET:
+        params["ratio_set"] = RATIO_SET
+    response = get_session().get(url, params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+def _flatten(item):
+    # the sidebar reads prediction and weather fields from one flat dict
+    flat = {**(item.get("prediction") or {}), **(item.get("weather") or {})}
+    flat["version_mismatch"] = item.get("version_mismatch", False)
+    return flat
+
+
+def _fetch_changes(since=None, refresh=False):
+    params = {}
+    if since is not None:
+        params["since"] = since
+    if refresh:
+        params["refresh"] = "true"  # ask the backend to rebuild its snapshot first
+    payload = _get_json(SUMMARY_URL, params=params)
+    return {
+        "version": payload["version"],
+        "built_at": payload.get("built_at"),
+        "stale": payload.get("stale", False),
+        "full": payload.get("full", since is None),
+        "counties": {item["county"]: item for item in payload.get("results", [])},
+    }
+
+
+@st.cache_data(ttl=BANDS_CHECK_TTL, show_spinner=False)
+def _ratio_set_stamp():
+    """(name, loaded_at) of the ratio set we colour with; changes when the backend hot-swaps it."""
+    payload = _get_json(RATIO_SETS_URL)
+    name = RATIO_SET or payload["default"]
+    for info in payload.get("sets", []):
+        if info["name"] == name:
+            return name, info["loaded_at"]
+    raise RuntimeError(f"Unknown ratio set: {name}")
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _bands_at(name, loaded_at):
+    payload = _get_json(BANDS_URL)
+    if "error" in payload:
+        raise RuntimeError(payload["error"])  # raising keeps it out of the cache
+    return payload
+
+
+def fetch_bands():
+    """Band thresholds of the current ratio set, re-fetched only after it was reloaded."""
+    return _bands_at(*_ratio_set_stamp())
+
+
+@st.cache_data(ttl=SNAPSHOT_TTL, show_spinner="Loading county data…")
+def fetch_summary():
+    """Map summary: {"version", "built_at", "stale", "counties": {name: {"county", "predicted_cases"}}}."""
+    return _fetch_changes()
+
+
+@st.cache_data(ttl=SNAPSHOT_TTL, max_entries=64, show_spinner=False)
+def fetch_county_detail(county, version):
+    """
+    Full sidebar record for one county at the map's snapshot `version` (also the cache key).
+    version_mismatch=True means the backend has newer data than the map shows.
+    """
+    return _flatten(_get_json(f"{DETAIL_URL}/{quote(county, safe='')}", params={"version": version}))
+
+
+def start_refresh(since, rebuild=True):
+    """
+    Fetch counties changed since `since` off the script thread (rebuild=True asks the
+    backend to rebuild its snapshot first); returns a Future.
+    """
+    return _refresh_executor().submit(_fetch_changes, since, rebuild)
+
+
+def merge_refresh(county_data, version, result):
+    """Apply a finished refresh on top of the current data; returns (county_data, version)."""
+    if result["version"] == version:
+        return county_data, version
+    if result["full"]:
+        return result["counties"], result["version"]
+    merged = dict(county_data)
+    merged.update(result["counties"])
+    return merged, result["version"]
@@ -28,7 +28,28 @@ def _fmt_ratio(x):
 def _risk_chip(label, ratio, emoji):
     return f"{emoji} **{label}:** {_fmt_ratio(ratio)}"
 
-def render_weather_sidebar(sidebar, county_name, county_data):
+def _legend_lines(band_def, var, unit=""):
+    # One markdown line per band, e.g. "🟨 **Mild**: 1.3 ≤ R < 1.6"
+    thresholds = band_def.get("thresholds") or []
+    emoji = band_def.get("emoji") or []
+    labels = band_def.get("labels") or []
+    suffix = f" {unit}" if unit else ""
+    lines = []
+    for i, (e, label) in enumerate(zip(emoji, labels)):
+        lo = thresholds[i - 1] if i > 0 else None
+        hi = thresholds[i] if i < len(thresholds) else None
+        if lo is None and hi is None:
+            rng = f"any {var}"
+        elif lo is None:
+            rng = f"{var} < {hi}{suffix}"
+        elif hi is None:
+            rng = f"{var} ≥ {lo}{suffix}"
+        else:
+            rng = f"{lo} ≤ {var} < {hi}{suffix}"
+        lines.append(f"{e} **{label}**: {rng}")
+    return lines
+
+def render_weather_sidebar(sidebar, county_name, county_data, bands=None):
     # Pull forecast safely
     days = county_data.get("forecast_mean") or []
     tm = days[0] if len(days) > 0 else {}
@@ -104,14 +125,11 @@ def render_weather_sidebar(sidebar, county_name, county_data):
     # =======================
     # Legends
     # =======================
+    bands = bands or {}
     with sidebar.expander("🧪 Risk Legend (ratio → color)", expanded=False):
-        st.markdown("🟩 **Low**: R < 0.8")
-        st.markdown("⬜ **Neutral-ish**: 0.8 ≤ R < 1.3")
-        st.markdown("🟨 **Mild**: 1.3 ≤ R < 1.6")
-        st.markdown("🟧 **Moderate**: 1.6 ≤ R < 2.3")
-        st.markdown("🟥 **High**: R ≥ 2.3")
+        for line in _legend_lines(bands.get("ratio") or {}, "R"):
+            st.markdown(line)
 
     with sidebar.expander("🗺️ Map Legend (predicted cases)", expanded=False):
-        st.markdown("🟩 **Low:** Predicted < 60 cases")
-        st.markdown("🟧 **Moderate:** 60 ≤ Predicted < 90 cases")
-        st.markdown("🟥 **High:** Predicted ≥ 90 cases")
+        for line in _legend_lines(bands.get("cases") or {}, "Predicted", "cases"):
+            st.markdown(line)